@@ -2,16 +2,20 @@
 
 import logging
 import os
-from flask import Flask, request, jsonify, send_from_directory
+import numpy as np
+from functools import lru_cache
+from scipy.spatial.distance import cdist
+from collections import Counter
+from flask import Flask, Response, request, jsonify, send_from_directory
 from typing import Any, Dict
 
 from domain import (
     CityPlanSolution, BuildingPlacement, Location,
-    BuildingType, ZoneType
+    BuildingType, ZoneType, BUILDING_TYPE_BY_VALUE, ZONE_TYPE_BY_VALUE
 )
-from constraints import define_constraints, is_building_type_allowed_in_zone, calc_distance
+from constraints import define_constraints, is_building_type_allowed_in_zone
 from solve import solve_city_plan
-import json
+import orjson
 
 app = Flask(__name__, static_folder="static")
 logging.basicConfig(level=logging.INFO)
@@ -31,10 +35,8 @@ def solve_endpoint():
     """
     if request.method == "GET":
         small_file = os.path.join(TEST_DATA_DIR, "PlanSmall.json")
-        problem = load_solution_from_json(small_file)
-        best_solution = solve_city_plan(problem)
-        breakdown = get_score_breakdown(best_solution)
-        return jsonify(solution_to_dict(best_solution, breakdown))
+        body = _solve_plan_cached("PlanSmall", os.path.getmtime(small_file))
+        return Response(body, mimetype="application/json")
 
     if request.method == "POST":
         data = request.get_json() or {}
@@ -43,7 +45,7 @@ def solve_endpoint():
         problem = build_solution_from_data(data)
         best_solution = solve_city_plan(problem)
         breakdown = get_score_breakdown(best_solution)
-        return jsonify(solution_to_dict(best_solution, breakdown))
+        return json_response(solution_to_dict(best_solution, breakdown))
 
 @app.route("/solve/<plan_name>", methods=["GET"])
 def solve_with_plan(plan_name):
@@ -56,17 +58,27 @@ def solve_with_plan(plan_name):
     if not os.path.exists(path):
         return jsonify({"error": f"No such plan file: {file_name}"}), 404
 
+    body = _solve_plan_cached(plan_name, os.path.getmtime(path))
+    return Response(body, mimetype="application/json")
+
+@lru_cache(maxsize=16)
+def _solve_plan_cached(plan_name: str, mtime: float) -> bytes:
+    """
+    Atrisina test_data plānu un kešo jau serializētu atbildi.
+    mtime ir daļa no atslēgas - ja fails mainās, plāns tiek risināts no jauna.
+    """
+    path = os.path.join(TEST_DATA_DIR, f"{plan_name}.json")
     problem = load_solution_from_json(path)
     best_solution = solve_city_plan(problem)
     breakdown = get_score_breakdown(best_solution)
-    return jsonify(solution_to_dict(best_solution, breakdown))
+    return _dumps(solution_to_dict(best_solution, breakdown))
 
 def load_solution_from_json(path: str) -> CityPlanSolution:
     """
     Ielasa no faila
     """
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
     return build_solution_from_data(data)
 
 def build_solution_from_data(data: Dict[str, Any]) -> CityPlanSolution:
@@ -81,18 +93,18 @@ def build_solution_from_data(data: Dict[str, Any]) -> CityPlanSolution:
             name=loc["name"],
             x=float(loc["x"]),
             y=float(loc["y"]),
-            zone=ZoneType(loc["zone"]),
+            zone=ZONE_TYPE_BY_VALUE[loc["zone"]],
             cost_factor=float(loc.get("cost_factor", 1.0)),
-            allowed_building_types=[
-                BuildingType(bt) for bt in loc.get("allowed_building_types", [])
-            ]
+            allowed_building_types=frozenset(
+                BUILDING_TYPE_BY_VALUE[bt] for bt in loc.get("allowed_building_types", [])
+            )
         ))
 
     building_list = []
     for b in bld_raw:
         building_list.append(BuildingPlacement(
             id=int(b["id"]),
-            building_type=BuildingType(b["building_type"]),
+            building_type=BUILDING_TYPE_BY_VALUE[b["building_type"]],
             location=None
         ))
 
@@ -106,122 +118,128 @@ def get_score_breakdown(solution: CityPlanSolution):
     """
     Manuāla "constraint breakdown" atkārtota no constraints.py
     """
-    placements = solution.building_placement_list
-    breakdown = []
-
-    # Disallowed (HARD)
-    name = "Building in disallowed location (HARD)"
     disallowed_count = 0
-    for bp in placements:
-        if bp.location and bp.building_type not in bp.location.allowed_building_types:
-            disallowed_count += 1
-    breakdown.append({
-        "constraintName": name,
-        "hardPenalty": -disallowed_count,
-        "softPenalty": 0
-    })
-
-    # Zoning mismatch (HARD)
-    name = "Zoning mismatch (HARD)"
     zoning_count = 0
-    for bp in placements:
-        if bp.location and not is_building_type_allowed_in_zone(bp.building_type, bp.location.zone):
-            zoning_count += 1
-    breakdown.append({
-        "constraintName": name,
-        "hardPenalty": -zoning_count,
-        "softPenalty": 0
-    })
-
-    # Location uniqueness (HARD)
-    name = "Location uniqueness (HARD)"
-    uniq_count = 0
-    n = len(placements)
-    for i in range(n):
-        for j in range(i+1, n):
-            bp1 = placements[i]
-            bp2 = placements[j]
-            if bp1.location and bp2.location and bp1.location == bp2.location:
-                uniq_count += 1
-    breakdown.append({
-        "constraintName": name,
-        "hardPenalty": -uniq_count,
-        "softPenalty": 0
-    })
-
-    # House-School distance (SOFT)
-    name = "Distance between HOUSE and SCHOOL (SOFT)"
-    hs_sum = 0.0
-    for i in range(n):
-        for j in range(i+1, n):
-            bp1 = placements[i]
-            bp2 = placements[j]
-            if bp1.location and bp2.location:
-                if ((bp1.building_type == BuildingType.HOUSE and bp2.building_type == BuildingType.SCHOOL)
-                   or (bp1.building_type == BuildingType.SCHOOL and bp2.building_type == BuildingType.HOUSE)):
-                    hs_sum += calc_distance(bp1, bp2)
-    breakdown.append({
-        "constraintName": name,
-        "hardPenalty": 0,
-        "softPenalty": -hs_sum
-    })
-
-    # House-Office distance (SOFT)
-    name = "Distance between HOUSE and OFFICE (SOFT)"
-    ho_sum = 0.0
-    for i in range(n):
-        for j in range(i+1, n):
-            bp1 = placements[i]
-            bp2 = placements[j]
-            if bp1.location and bp2.location:
-                if ((bp1.building_type == BuildingType.HOUSE and bp2.building_type == BuildingType.OFFICE)
-                   or (bp1.building_type == BuildingType.OFFICE and bp2.building_type == BuildingType.HOUSE)):
-                    ho_sum += calc_distance(bp1, bp2)
-    breakdown.append({
-        "constraintName": name,
-        "hardPenalty": 0,
-        "softPenalty": -ho_sum
-    })
-
-    # Building cost (SOFT)
-    name = "Building cost minimization (SOFT)"
     cost_sum = 0.0
-    for bp in placements:
-        if bp.location:
-            cost_sum += bp.location.cost_factor
-    breakdown.append({
-        "constraintName": name,
-        "hardPenalty": 0,
-        "softPenalty": -cost_sum
-    })
-
-    return breakdown
+    location_counts = Counter()
+    houses, schools, offices = [], [], []
+
+    placed = [bp for bp in solution.building_placement_list if bp.location is not None]
+
+    # Local names for everything used inside the loop
+    HOUSE = BuildingType.HOUSE
+    SCHOOL = BuildingType.SCHOOL
+    OFFICE = BuildingType.OFFICE
+    zone_allows = is_building_type_allowed_in_zone
+    add_house = houses.append
+    add_school = schools.append
+    add_office = offices.append
+
+    # Single pass over placed buildings for all per-building checks
+    for bp in placed:
+        loc = bp.location
+        bt = bp.building_type
+        if bt not in loc.allowed_building_types:
+            disallowed_count += 1
+        if not zone_allows(bt, loc.zone):
+            zoning_count += 1
+        cost_sum += loc.cost_factor
+        location_counts[loc.id] += 1
+        if bt is HOUSE:
+            add_house((loc.x, loc.y))
+        elif bt is SCHOOL:
+            add_school((loc.x, loc.y))
+        elif bt is OFFICE:
+            add_office((loc.x, loc.y))
+
+    uniq_count = sum(c * (c - 1) // 2 for c in location_counts.values() if c > 1)
+    # Only HOUSE x SCHOOL and HOUSE x OFFICE pairs are measured
+    hs_sum = _cross_distance_sum(houses, schools)
+    ho_sum = _cross_distance_sum(houses, offices)
+
+    return [
+        {
+            "constraintName": "Building in disallowed location (HARD)",
+            "hardPenalty": -disallowed_count,
+            "softPenalty": 0
+        },
+        {
+            "constraintName": "Zoning mismatch (HARD)",
+            "hardPenalty": -zoning_count,
+            "softPenalty": 0
+        },
+        {
+            "constraintName": "Location uniqueness (HARD)",
+            "hardPenalty": -uniq_count,
+            "softPenalty": 0
+        },
+        {
+            "constraintName": "Distance between HOUSE and SCHOOL (SOFT)",
+            "hardPenalty": 0,
+            "softPenalty": -hs_sum
+        },
+        {
+            "constraintName": "Distance between HOUSE and OFFICE (SOFT)",
+            "hardPenalty": 0,
+            "softPenalty": -ho_sum
+        },
+        {
+            "constraintName": "Building cost minimization (SOFT)",
+            "hardPenalty": 0,
+            "softPenalty": -cost_sum
+        },
+    ]
+
+def _cross_distance_sum(points_a, points_b) -> float:
+    """
+    Summa no visiem attālumiem starp punktiem kopā A un kopā B
+    """
+    if not points_a or not points_b:
+        return 0.0
+    return float(cdist(np.array(points_a), np.array(points_b)).sum())
 
 def solution_to_dict(solution: CityPlanSolution, breakdown):
-    placements_out = []
-    for bp in solution.building_placement_list:
-        loc_data = None
-        if bp.location:
-            loc_data = {
-                "id": bp.location.id,
-                "name": bp.location.name,
-                "x": bp.location.x,
-                "y": bp.location.y,
-                "zone": bp.location.zone.value,
-                "cost_factor": bp.location.cost_factor
-            }
-        placements_out.append({
-            "id": bp.id,
-            "building_type": bp.building_type.value,
-            "location": loc_data
-        })
-
+    """
+    Placements paliek kā objekti - tos pārvērš _encode serializācijas laikā
+    """
     return {
         "solution_id": solution.id,
         "score": str(solution.score) if solution.score else "None",
-        "placements": placements_out,
+        "placements": solution.building_placement_list,
         "constraintBreakdown": breakdown
     }
 
+def _encode(obj):
+    """
+    orjson 'default' hook domēna objektiem
+    """
+    if isinstance(obj, BuildingPlacement):
+        return {
+            "id": obj.id,
+            "building_type": obj.building_type,
+            "location": obj.location
+        }
+    if isinstance(obj, Location):
+        return {
+            "id": obj.id,
+            "name": obj.name,
+            "x": obj.x,
+            "y": obj.y,
+            "zone": obj.zone,
+            "cost_factor": obj.cost_factor
+        }
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def _dumps(payload) -> bytes:
+    return orjson.dumps(payload, default=_encode, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+
+def json_response(payload) -> Response:
+    return Response(_dumps(payload), mimetype="application/json")
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    if os.environ.get("FLASK_DEBUG", "").lower() in ("1", "true", "yes"):
+        app.run(host="0.0.0.0", port=5000, debug=True)
+    else:
+        # Produkcijas WSGI serveris - bez Werkzeug debugger/reloader
+        from waitress import serve
+        serve(app, host="0.0.0.0", port=5000, threads=8)
@@ -1,15 +1,20 @@
-import json, time
+import multiprocessing, os, time
+import orjson
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from timefold.solver import SolverFactory
 from timefold.solver.config import (
     SolverConfig, ScoreDirectorFactoryConfig, TerminationConfig, Duration
 )
-from domain import CityPlanSolution, Location, BuildingPlacement, BuildingType, ZoneType
+from domain import CityPlanSolution, Location, BuildingPlacement, BUILDING_TYPE_BY_VALUE, ZONE_TYPE_BY_VALUE
 from constraints import define_constraints
 
 
-def load_solution_from_json(path):
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def _parse(path):
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def _build(data):
     # Atkārto build_solution_from_json loģiku
     sol_id = data.get("id", "PlanX")
     locs_raw = data.get("locations", [])
@@ -22,11 +27,11 @@ def load_solution_from_json(path):
             name=loc["name"],
             x=float(loc["x"]),
             y=float(loc["y"]),
-            zone=ZoneType(loc["zone"]),
+            zone=ZONE_TYPE_BY_VALUE[loc["zone"]],
             cost_factor=float(loc.get("cost_factor", 1.0)),
-            allowed_building_types=[
-                BuildingType(bt) for bt in loc.get("allowed_building_types", [])
-            ]
+            allowed_building_types=frozenset(
+                BUILDING_TYPE_BY_VALUE[bt] for bt in loc.get("allowed_building_types", [])
+            )
         ))
 
     building_list = []
@@ -34,7 +39,7 @@ def load_solution_from_json(path):
         building_list.append(
             BuildingPlacement(
                 id=int(b["id"]),
-                building_type=BuildingType(b["building_type"]),
+                building_type=BUILDING_TYPE_BY_VALUE[b["building_type"]],
                 location=None
             )
         )
@@ -73,6 +78,13 @@ def run_solver(solution, local_search_type=None, time_limit_s=5):
     return best_solution.score, elapsed
 
 
+def run_task(path, raw, cfg):
+    # Katrs palaidiens uzbūvē savu, neatkarīgu risinājuma objektu grafu
+    solution = _build(raw)
+    score, duration = run_solver(solution, local_search_type=cfg["lsType"], time_limit_s=5)
+    return path, cfg["name"], str(score), duration
+
+
 def main():
     # Dažādi testa faili
     test_files = ["test_data/PlanSmall.json", "test_data/PlanMedium.json", "test_data/PlanLarge.json"]
@@ -87,12 +99,20 @@ def main():
     # Tabulu ar rezultātiem
     print("TestFile, ConfigName, Score, TimeSec")
 
-    for f in test_files:
-        # Ielādē izejas risinājumu
-        solution = load_solution_from_json(f)
-        for cfg in configs:
-            score, duration = run_solver(solution, local_search_type=cfg["lsType"], time_limit_s=5)
-            print(f"{f}, {cfg['name']}, {score}, {duration:.3f}")
+    # Visi (fails, konfigurācija) palaidieni ir neatkarīgi - risinām paralēli
+    max_workers = max(1, (os.cpu_count() or 2) // 2)
+    # "spawn", jo JVM jau ir startēta šajā procesā - JPype nedarbojas fork'otā bērnā
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=spawn) as executor:
+        futures = []
+        for f in test_files:
+            # JSON parsē vienreiz katram failam; katrs uzdevums saņem savu dict kopiju
+            raw = _parse(f)
+            for cfg in configs:
+                futures.append(executor.submit(run_task, f, raw, cfg))
+        for future in as_completed(futures):
+            f, name, score, duration = future.result()
+            print(f"{f}, {name}, {score}, {duration:.3f}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 # constraints.py
 
-from math import dist
+from math import sqrt
 from timefold.solver.score import (
-    ConstraintFactory, Constraint, constraint_provider, HardSoftScore
+    ConstraintFactory, Constraint, constraint_provider, HardSoftScore, Joiners
 )
 from domain import (
     BuildingPlacement, Location, BuildingType, ZoneType
@@ -45,12 +45,11 @@ def build_house_school_distance_constraint(cf: ConstraintFactory) -> Constraint:
     Penalize distance between House and School, to keep them close.
     """
     return (
-        cf.for_each_unique_pair(BuildingPlacement)
-        # Filter for House vs School
-        .filter(lambda bp1, bp2:
-                ((bp1.building_type == BuildingType.HOUSE and bp2.building_type == BuildingType.SCHOOL) or
-                 (bp1.building_type == BuildingType.SCHOOL and bp2.building_type == BuildingType.HOUSE))
-                and bp1.location is not None and bp2.location is not None)
+        cf.for_each(BuildingPlacement)
+        .filter(lambda bp: bp.building_type == BuildingType.HOUSE and bp.location is not None)
+        # Join Houses only against Schools, instead of filtering every pair
+        .join(cf.for_each(BuildingPlacement)
+              .filter(lambda bp: bp.building_type == BuildingType.SCHOOL and bp.location is not None))
         # Penalize the Euclidean distance
         .penalize(HardSoftScore.ONE_SOFT, lambda bp1, bp2: calc_distance(bp1, bp2))
         .as_constraint("Distance between HOUSE and SCHOOL (SOFT)")
@@ -63,11 +62,10 @@ def build_house_office_distance_constraint(cf: ConstraintFactory) -> Constraint:
     Penalize distance between House and Office, to reduce commutes.
     """
     return (
-        cf.for_each_unique_pair(BuildingPlacement)
-        .filter(lambda bp1, bp2:
-                ((bp1.building_type == BuildingType.HOUSE and bp2.building_type == BuildingType.OFFICE) or
-                 (bp1.building_type == BuildingType.OFFICE and bp2.building_type == BuildingType.HOUSE))
-                and bp1.location is not None and bp2.location is not None)
+        cf.for_each(BuildingPlacement)
+        .filter(lambda bp: bp.building_type == BuildingType.HOUSE and bp.location is not None)
+        .join(cf.for_each(BuildingPlacement)
+              .filter(lambda bp: bp.building_type == BuildingType.OFFICE and bp.location is not None))
         .penalize(HardSoftScore.ONE_SOFT, lambda bp1, bp2: calc_distance(bp1, bp2))
         .as_constraint("Distance between HOUSE and OFFICE (SOFT)")
     )
@@ -79,8 +77,12 @@ def build_location_uniqueness_constraint(cf: ConstraintFactory) -> Constraint:
     Ensure that each Location can only have one BuildingPlacement.
     """
     return (
-        cf.for_each_unique_pair(BuildingPlacement)
-        .filter(lambda bp1, bp2: bp1.location is not None and bp1.location == bp2.location)
+        cf.for_each(BuildingPlacement)
+        .filter(lambda bp: bp.location is not None)
+        # Hash-indexed on location id, so only buildings sharing a location are paired
+        .join(cf.for_each(BuildingPlacement).filter(lambda bp: bp.location is not None),
+              Joiners.equal(lambda bp: bp.location.id),
+              Joiners.less_than(lambda bp: bp.id))
         .penalize(HardSoftScore.ONE_HARD)
         .as_constraint("Location uniqueness (HARD)")
     )
@@ -120,9 +122,35 @@ def build_cost_constraint(cf: ConstraintFactory) -> Constraint:
 
 
 def calc_distance(bp1: BuildingPlacement, bp2: BuildingPlacement) -> float:
-    p1 = (bp1.location.x, bp1.location.y)
-    p2 = (bp2.location.x, bp2.location.y)
-    return dist(p1, p2)
+    loc1 = bp1.location
+    loc2 = bp2.location
+    dx = loc1.x - loc2.x
+    dy = loc1.y - loc2.y
+    return sqrt(dx * dx + dy * dy)
+
+
+def calc_sq_distance(bp1: BuildingPlacement, bp2: BuildingPlacement) -> float:
+    """
+    Squared Euclidean distance, skipping the sqrt.
+    Only for comparing/ranking distances - the distance penalties are sums,
+    so they must keep using calc_distance.
+    """
+    loc1 = bp1.location
+    loc2 = bp2.location
+    dx = loc1.x - loc2.x
+    dy = loc1.y - loc2.y
+    return dx * dx + dy * dy
+
+
+# Zones each building type may be placed in (RESTRICTED never allows anything)
+_ALLOWED_ZONES = {
+    BuildingType.HOUSE: frozenset({ZoneType.RESIDENTIAL, ZoneType.MIXED, ZoneType.COMMERCIAL}),
+    BuildingType.OFFICE: frozenset({ZoneType.COMMERCIAL, ZoneType.MIXED}),
+    BuildingType.SHOP: frozenset({ZoneType.COMMERCIAL, ZoneType.MIXED}),
+    BuildingType.SCHOOL: frozenset({ZoneType.RESIDENTIAL, ZoneType.MIXED}),
+    BuildingType.HOSPITAL: frozenset({ZoneType.RESIDENTIAL, ZoneType.MIXED}),
+    BuildingType.PHARMACY: frozenset({ZoneType.RESIDENTIAL, ZoneType.MIXED, ZoneType.COMMERCIAL}),
+}
 
 
 def is_building_type_allowed_in_zone(building_type: BuildingType, zone: ZoneType) -> bool:
@@ -134,21 +162,4 @@ def is_building_type_allowed_in_zone(building_type: BuildingType, zone: ZoneType
       - Shops in COMMERCIAL, MIXED
       - Industry in INDUSTRIAL, maybe also MIXED
     """
-    if zone == ZoneType.RESTRICTED:
-        return False
-
-    if building_type == BuildingType.HOUSE and zone in [ZoneType.RESIDENTIAL, ZoneType.MIXED, ZoneType.COMMERCIAL]:
-        return True
-    if building_type == BuildingType.OFFICE and zone in [ZoneType.COMMERCIAL, ZoneType.MIXED]:
-        return True
-    if building_type == BuildingType.SHOP and zone in [ZoneType.COMMERCIAL, ZoneType.MIXED]:
-        return True
-    if building_type == BuildingType.SCHOOL and zone in [ZoneType.RESIDENTIAL, ZoneType.MIXED]:
-        return True
-    if building_type == BuildingType.HOSPITAL and zone in [ZoneType.RESIDENTIAL, ZoneType.MIXED]:
-        return True
-    if building_type == BuildingType.PHARMACY and zone in [ZoneType.RESIDENTIAL, ZoneType.MIXED, ZoneType.COMMERCIAL]:
-        return True
-
-    # If not matched, return False
-    return False
+    return zone != ZoneType.RESTRICTED and zone in _ALLOWED_ZONES.get(building_type, frozenset())
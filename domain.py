@@ -1,10 +1,10 @@
 from timefold.solver.domain import planning_entity, planning_solution, PlanningId, PlanningVariable
 from timefold.solver.domain import PlanningEntityCollectionProperty, ProblemFactCollectionProperty, ValueRangeProvider
-from timefold.solver.domain import PlanningScore
+from timefold.solver.domain import PlanningScore, PlanningPin
 from timefold.solver.score import HardSoftScore
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Annotated, List, Optional
+from typing import Annotated, FrozenSet, List, Optional
 
 
 class BuildingType(Enum):
@@ -24,7 +24,12 @@ class ZoneType(Enum):
     RESTRICTED = "RESTRICTED"
 
 
-@dataclass
+# value -> Enum member, so loaders don't call the Enum constructor per field
+BUILDING_TYPE_BY_VALUE = {b.value: b for b in BuildingType}
+ZONE_TYPE_BY_VALUE = {z.value: z for z in ZoneType}
+
+
+@dataclass(eq=False)
 class Location:
     """
     Problem Fact:
@@ -32,6 +37,7 @@ class Location:
       - 'cost_factor': an arbitrary numeric cost for building on this location.
       - 'allowed_building_types': which building types are definitely allowed here
         (used by the 'disallowed_location' constraint).
+    Compared by identity - each Location is a single shared object from location_list.
     """
     id: int
     name: str
@@ -39,7 +45,7 @@ class Location:
     y: float
     zone: ZoneType
     cost_factor: float = 1.0
-    allowed_building_types: List[BuildingType] = field(default_factory=list)
+    allowed_building_types: FrozenSet[BuildingType] = field(default_factory=frozenset)
 
 
 @planning_entity
@@ -51,6 +57,8 @@ class BuildingPlacement:
         Optional[Location],
         PlanningVariable(value_range_provider_refs=["locationRange"])
     ] = None
+    # Pinned placements keep their location during a (partial) solve
+    pinned: Annotated[bool, PlanningPin] = False
 
 
 @planning_solution
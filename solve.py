@@ -4,10 +4,12 @@ from timefold.solver import SolverFactory
 from timefold.solver.config import (
     SolverConfig,
     ScoreDirectorFactoryConfig,
+    SolverConfigOverride,
     TerminationConfig,
     Duration
 )
 import logging
+import random
 
 from domain import (
     CityPlanSolution,
@@ -16,11 +18,22 @@ from domain import (
     BuildingType,
     ZoneType
 )
-from constraints import define_constraints
+from constraints import define_constraints, calc_sq_distance
 
 logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger("city-planner")
 
+# Total solve time; a staged solve splits it over all of its phases
+SOLVE_MILLISECONDS = 5000
+# Smaller plans get a single solve (staging gave no gain on PlanLarge, 15 buildings)
+STAGED_MIN_BUILDINGS = 100
+# Extending horizon: the plan is placed in HORIZON_PHASES growing slices
+HORIZON_PHASES = 3
+HORIZON_BUDGET_SHARE = 0.6
+# LNS: re-optimize the LNS_NEIGHBORHOOD_SIZE nearest buildings around a random seed
+LNS_NEIGHBORHOOD_SIZE = 5
+LNS_ITERATIONS = 4
+
 
 def create_initial_solution() -> CityPlanSolution:
     """
@@ -37,7 +50,7 @@ def create_initial_solution() -> CityPlanSolution:
         y=0.0,
         zone=ZoneType.RESIDENTIAL,
         cost_factor=3.0,
-        allowed_building_types=[BuildingType.HOUSE, BuildingType.SCHOOL, BuildingType.HOSPITAL]
+        allowed_building_types=frozenset({BuildingType.HOUSE, BuildingType.SCHOOL, BuildingType.HOSPITAL})
     )
     loc2 = Location(
         id=2,
@@ -46,7 +59,7 @@ def create_initial_solution() -> CityPlanSolution:
         y=0.0,
         zone=ZoneType.COMMERCIAL,
         cost_factor=7.0,
-        allowed_building_types=[BuildingType.OFFICE, BuildingType.SHOP, BuildingType.PHARMACY]
+        allowed_building_types=frozenset({BuildingType.OFFICE, BuildingType.SHOP, BuildingType.PHARMACY})
     )
     loc3 = Location(
         id=3,
@@ -55,7 +68,7 @@ def create_initial_solution() -> CityPlanSolution:
         y=5.0,
         zone=ZoneType.MIXED,
         cost_factor=10.0,
-        allowed_building_types=[BuildingType.HOUSE, BuildingType.OFFICE, BuildingType.SCHOOL, BuildingType.SHOP]
+        allowed_building_types=frozenset({BuildingType.HOUSE, BuildingType.OFFICE, BuildingType.SCHOOL, BuildingType.SHOP})
     )
     loc4 = Location(
         id=4,
@@ -64,7 +77,7 @@ def create_initial_solution() -> CityPlanSolution:
         y=5.0,
         zone=ZoneType.RESTRICTED,
         cost_factor=1.0,  # Cheap, but restricted
-        allowed_building_types=[]
+        allowed_building_types=frozenset()
     )
 
     # Building placements
@@ -93,6 +106,82 @@ def create_initial_solution() -> CityPlanSolution:
 
 
 def solve_city_plan(problem: CityPlanSolution) -> CityPlanSolution:
+    """
+    Plans below STAGED_MIN_BUILDINGS are solved in one go. Larger plans are
+    built up with an extending horizon (earlier placements pinned), then
+    improved with a few LNS rounds that unpin one spatial neighborhood at a time.
+    Either way the solve takes SOLVE_MILLISECONDS and the caller's problem is left untouched.
+    """
+    solver_factory = _create_solver_factory()
+    if len(problem.building_placement_list) < STAGED_MIN_BUILDINGS:
+        return _build_solver(solver_factory, SOLVE_MILLISECONDS).solve(problem)
+
+    # Private copies, so pinning and intermediate locations don't leak to the caller
+    buildings = [
+        BuildingPlacement(id=bp.id, building_type=bp.building_type, location=bp.location)
+        for bp in problem.building_placement_list
+    ]
+    working = CityPlanSolution(
+        id=problem.id,
+        location_list=problem.location_list,
+        building_placement_list=buildings
+    )
+    locations_by_id = {loc.id: loc for loc in problem.location_list}
+
+    horizon_ms = int(SOLVE_MILLISECONDS * HORIZON_BUDGET_SHARE) // HORIZON_PHASES
+    lns_ms = (SOLVE_MILLISECONDS - horizon_ms * HORIZON_PHASES) // LNS_ITERATIONS
+    step = -(-len(buildings) // HORIZON_PHASES)
+
+    best_solution = None
+    for k in range(step, len(buildings) + step, step):
+        horizon = buildings[:k]
+        partial = CityPlanSolution(
+            id=problem.id,
+            location_list=problem.location_list,
+            building_placement_list=horizon
+        )
+        frozen_ids = {bp.id for bp in horizon if bp.location is not None}
+        best_solution = _solve_partial(solver_factory, partial, frozen_ids, horizon_ms)
+        _apply_locations(horizon, best_solution, locations_by_id)
+
+    rng = random.Random(0)
+    for _ in range(LNS_ITERATIONS):
+        # Unassigned buildings (construction cut off) are never pinned, only placed ones are ranked
+        placed = [bp for bp in buildings if bp.location is not None]
+        if not placed:
+            break
+        seed = rng.choice(placed)
+        neighborhood = sorted(placed, key=lambda bp: calc_sq_distance(seed, bp))[:LNS_NEIGHBORHOOD_SIZE]
+        free_ids = {bp.id for bp in neighborhood}
+        frozen_ids = {bp.id for bp in placed if bp.id not in free_ids}
+        best_solution = _solve_partial(solver_factory, working, frozen_ids, lns_ms)
+        _apply_locations(buildings, best_solution, locations_by_id)
+
+    for bp in best_solution.building_placement_list:
+        bp.pinned = False
+    return best_solution
+
+
+def _solve_partial(solver_factory, problem: CityPlanSolution, frozen_ids, time_limit_ms: int) -> CityPlanSolution:
+    for bp in problem.building_placement_list:
+        bp.pinned = bp.id in frozen_ids
+    return _build_solver(solver_factory, time_limit_ms).solve(problem)
+
+
+def _apply_locations(buildings, solved: CityPlanSolution, locations_by_id):
+    """
+    Copy solver's result back onto our own entities, using our Location objects.
+    """
+    solved_locations = {bp.id: bp.location for bp in solved.building_placement_list}
+    for bp in buildings:
+        loc = solved_locations.get(bp.id)
+        bp.location = locations_by_id[loc.id] if loc is not None else None
+
+
+def _create_solver_factory():
+    """
+    Built once per solve_city_plan call - creating it compiles the constraint provider.
+    """
     solver_factory = SolverFactory.create(
         SolverConfig(
             solution_class=CityPlanSolution,
@@ -101,16 +190,19 @@ def solve_city_plan(problem: CityPlanSolution) -> CityPlanSolution:
                 constraint_provider_function=define_constraints
             ),
             termination_config=TerminationConfig(
-                spent_limit=Duration(seconds=5)
+                spent_limit=Duration(milliseconds=SOLVE_MILLISECONDS)
             ),
         )
     )
     solver_factory.construction_heuristic_type = "FIRST_FIT"
     solver_factory.local_search_type = "TABU_SEARCH"
-    solver = solver_factory.build_solver()
+    return solver_factory
 
-    best_solution = solver.solve(problem)
-    return best_solution
+
+def _build_solver(solver_factory, time_limit_ms: int):
+    return solver_factory.build_solver(SolverConfigOverride(
+        termination_config=TerminationConfig(spent_limit=Duration(milliseconds=time_limit_ms))
+    ))
 
 
 def main():